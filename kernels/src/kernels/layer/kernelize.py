@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from collections.abc import Mapping
 from copy import deepcopy
 from typing import TYPE_CHECKING
 
@@ -15,9 +16,9 @@ if TYPE_CHECKING:
 
 
 def use_kernel_mapping(
-    mapping: dict[
+    mapping: Mapping[
         str,
-        dict[
+        Mapping[
             Device | str,
             RepositoryProtocol | dict[Mode, RepositoryProtocol],
         ],
@@ -32,7 +33,7 @@ def use_kernel_mapping(
     kernel configurations for different parts of your code.
 
     Args:
-        mapping (`dict[str, dict[Union[Device, str], Union[LayerRepositoryProtocol, dict[Mode, LayerRepositoryProtocol]]]]`):
+        mapping (`Mapping[str, Mapping[Union[Device, str], Union[LayerRepositoryProtocol, dict[Mode, LayerRepositoryProtocol]]]]`):
             The kernel mapping to apply. Maps layer names to device-specific kernel configurations.
         inherit_mapping (`bool`, *optional*, defaults to `True`):
             When `True`, the current mapping will be extended by `mapping` inside the context. When `False`,
@@ -81,9 +82,11 @@ def use_kernel_mapping(
 
     class ContextManager:
         def __enter__(self):
-            # Mappings always stack on previous mappings.
+            # Mappings always stack on previous mappings. Only the outer dict
+            # is copied, `register_kernel_mapping` replaces the entries of
+            # layers rather than modifying them in place.
             if inherit_mapping:
-                self.token = _KERNEL_MAPPING.set(deepcopy(_KERNEL_MAPPING.get()))
+                self.token = _KERNEL_MAPPING.set(dict(_KERNEL_MAPPING.get()))
             else:
                 self.token = _KERNEL_MAPPING.set({})
             register_kernel_mapping(mapping)
@@ -95,9 +98,9 @@ def use_kernel_mapping(
 
 
 def register_kernel_mapping(
-    mapping: dict[
+    mapping: Mapping[
         str,
-        dict[
+        Mapping[
             Device | str,
             RepositoryProtocol | dict[Mode, RepositoryProtocol],
         ],
@@ -111,7 +114,7 @@ def register_kernel_mapping(
     depending on the device and mode. This should be used in conjunction with [`kernelize`].
 
     Args:
-        mapping (`dict[str, dict[Union[Device, str], Union[RepositoryProtocol, dict[Mode, RepositoryProtocol]]]]`):
+        mapping (`Mapping[str, Mapping[Union[Device, str], Union[RepositoryProtocol, dict[Mode, RepositoryProtocol]]]]`):
             The kernel mapping to register globally. Maps layer names to device-specific kernels.
             The mapping can specify different kernels for different modes (training, inference, etc.).
         inherit_mapping (`bool`, *optional*, defaults to `True`):
@@ -157,9 +160,14 @@ def register_kernel_mapping(
     if not inherit_mapping:
         _KERNEL_MAPPING.set({})
 
-    # Merge with existing mappings.
+    kernel_mapping = _KERNEL_MAPPING.get()
+
+    # Merge with existing mappings. `mapping` itself is only read, so it does
+    # not need to be copied and can be read-only (e.g. `MappingProxyType`).
     for new_kernel, new_device_repos in mapping.items():
-        device_repo = _KERNEL_MAPPING.get().setdefault(new_kernel, {})
+        # Entries can be shared with the mappings of other contexts, so they
+        # are copied and replaced rather than modified in place.
+        device_repo = dict(kernel_mapping.get(new_kernel, {}))
         for new_device, new_repo in new_device_repos.items():
             device = Device(type=new_device) if isinstance(new_device, str) else new_device
 
@@ -168,8 +176,15 @@ def register_kernel_mapping(
             else:
                 kernel_options = {Mode.FALLBACK: new_repo}
 
-            feature_repos = device_repo.setdefault(device.type, DeviceRepos.create_repo(device))
+            feature_repos = device_repo.get(device.type)
+            if feature_repos is None:
+                feature_repos = DeviceRepos.create_repo(device)
+            else:
+                feature_repos = deepcopy(feature_repos)
             feature_repos.insert(device, kernel_options)
+            device_repo[device.type] = feature_repos
+
+        kernel_mapping[new_kernel] = device_repo
 
 
 def kernelize(
@@ -509,7 +509,7 @@ def _validate_layer(*, check_cls, cls, repo: RepositoryProtocol):
         raise TypeError(f"{repo} must not override nn.Module constructor.")
 
     # ... or predefined member variables.
-    torch_module_members = {name for name, _ in inspect.getmembers(nn.Module)}
+    torch_module_members = _torch_module_members()
     cls_members = {name for name, _ in inspect.getmembers(cls)}
     difference = cls_members - torch_module_members
     # verify if : difference ⊄ {"can_torch_compile", "has_backward"}
@@ -517,21 +517,35 @@ def _validate_layer(*, check_cls, cls, repo: RepositoryProtocol):
         raise TypeError(f"{repo} must not contain additional members compared to `{check_cls.__name__}`.")
 
     # Check whether the forward signatures are similar.
-    params = inspect.signature(cls.forward).parameters
-    ref_params = inspect.signature(check_cls.forward).parameters
+    params = _extract_forward_sig(cls)
+    ref_params = _extract_forward_sig(check_cls)
 
     if len(params) != len(ref_params):
         raise TypeError(
             f"Forward signature of {repo} does not match `{check_cls.__name__}`: different number of arguments."
         )
 
-    for param, ref_param in zip(params.values(), ref_params.values()):
+    for param, ref_param in zip(params, ref_params):
         if param.kind != ref_param.kind:
             raise TypeError(
                 f"Forward signature of {repo} does not match `{check_cls.__name__}`: different kind of arguments ({param} ({param.kind}) and {ref_param} ({ref_param.kind})"
             )
 
 
+@functools.lru_cache(maxsize=None)
+def _torch_module_members() -> frozenset[str]:
+    """Get the names of the members of `nn.Module`."""
+    import torch.nn as nn
+
+    return frozenset(name for name, _ in inspect.getmembers(nn.Module))
+
+
+@functools.lru_cache(maxsize=512)
+def _extract_forward_sig(cls) -> tuple[Parameter, ...]:
+    """Get the parameters of the `forward` method of a layer class."""
+    return tuple(inspect.signature(cls.forward).parameters.values())
+
+
 def _conditionally_replace_forward(
     *,
     module: "nn.Module",
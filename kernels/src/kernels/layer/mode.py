@@ -27,12 +27,19 @@ class Mode(Flag):
     TORCH_COMPILE = auto()
 
     def __or__(self, other: "Mode") -> "Mode":
-        union = super().__or__(other)
+        if not isinstance(other, Mode):
+            return NotImplemented
 
-        if Mode.INFERENCE in union and Mode.TRAINING in union:
+        # Validate using the integer values, since flag membership tests are
+        # implemented in Python and create intermediate flags.
+        union = self._value_ | other._value_
+        inference_training = Mode.INFERENCE._value_ | Mode.TRAINING._value_
+        fallback = Mode.FALLBACK._value_
+
+        if union & inference_training == inference_training:
             raise ValueError("Mode.INFERENCE and Mode.TRAINING are mutually exclusive.")
 
-        if Mode.FALLBACK in union and union != Mode.FALLBACK:
+        if union & fallback and union != fallback:
             raise ValueError("Mode.FALLBACK cannot be combined with other modes.")
 
-        return union
+        return Mode(union)
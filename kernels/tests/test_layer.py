@@ -1,5 +1,8 @@
+import contextvars
 import sys
 from contextlib import nullcontext
+from pathlib import Path
+from types import MappingProxyType
 
 import pytest
 import torch
@@ -21,6 +24,7 @@ from kernels import (
 )
 from kernels.layer.layer import (
     _KERNEL_MAPPING,
+    _extract_forward_sig,
     _validate_layer,
 )
 from kernels.utils import (
@@ -34,41 +38,85 @@ def local_kernel_path():
     return install_kernel("kernels-test/silu-and-mul", revision="v1")
 
 
-kernel_layer_mapping = {
-    "SiluAndMul": {
-        Device(type="cuda"): LayerRepository(
-            repo_id="kernels-test/silu-and-mul",
-            layer_name="SiluAndMul",
-            version=1,
-        ),
-    },
-    "SiluAndMulNoCompile": {
-        "cuda": LayerRepository(
-            repo_id="kernels-test/op-without-fake-test",
-            layer_name="SiluAndMul",
-            revision="main",
-        ),
-        "rocm": LayerRepository(
-            repo_id="kernels-test/op-without-fake-test",
-            layer_name="SiluAndMul",
-            revision="main",
-        ),
-    },
-    "SiluAndMulStringDevice": {
-        "cuda": LayerRepository(
-            repo_id="kernels-test/silu-and-mul",
-            layer_name="SiluAndMul",
-            version=1,
-        )
-    },
-    "LigerRMSNorm": {
-        "xpu": LayerRepository(
-            repo_id="kernels-community/liger_kernels",
-            layer_name="LigerRMSNorm",  # Triton
-            revision="main",
-        )
-    },
-}
+@pytest.fixture(scope="module", autouse=True)
+def seed():
+    torch.random.manual_seed(0)
+
+
+# Inputs are shared between tests, so tests must not modify them.
+@pytest.fixture(scope="module")
+def x_32_64_cuda():
+    return torch.randn((32, 64), device="cuda")
+
+
+@pytest.fixture(scope="module")
+def x_10_32_cuda():
+    return torch.randn(10, 32, device="cuda")
+
+
+@pytest.fixture(scope="module")
+def reference_silu(x_32_64_cuda):
+    # The reference output is the same for every kernel, compute it once.
+    silu_and_mul = SiluAndMul(hidden_size=x_32_64_cuda.shape[-1])
+    with torch.inference_mode():
+        Y = silu_and_mul(x_32_64_cuda)
+    return x_32_64_cuda, Y
+
+
+@pytest.fixture(scope="session")
+def compiled_silu_kernel():
+    # Compiling is slow, so compile every selected forward only once. Layers
+    # are keyed on the forward that kernelize selected, so a kernel layer is
+    # shared with and without fallback, and so are the fallback forwards.
+    compiled = {}
+
+    def get(silu_and_mul):
+        forward = silu_and_mul.forward.__func__
+        if forward not in compiled:
+            compiled[forward] = torch.compile(silu_and_mul, fullgraph=True)
+        return compiled[forward]
+
+    return get
+
+
+# Read-only, to check that read-only kernel mappings are accepted.
+kernel_layer_mapping = MappingProxyType(
+    {
+        "SiluAndMul": {
+            Device(type="cuda"): LayerRepository(
+                repo_id="kernels-test/silu-and-mul",
+                layer_name="SiluAndMul",
+                version=1,
+            ),
+        },
+        "SiluAndMulNoCompile": {
+            "cuda": LayerRepository(
+                repo_id="kernels-test/op-without-fake-test",
+                layer_name="SiluAndMul",
+                revision="main",
+            ),
+            "rocm": LayerRepository(
+                repo_id="kernels-test/op-without-fake-test",
+                layer_name="SiluAndMul",
+                revision="main",
+            ),
+        },
+        "SiluAndMulStringDevice": {
+            "cuda": LayerRepository(
+                repo_id="kernels-test/silu-and-mul",
+                layer_name="SiluAndMul",
+                version=1,
+            )
+        },
+        "LigerRMSNorm": {
+            "xpu": LayerRepository(
+                repo_id="kernels-community/liger_kernels",
+                layer_name="LigerRMSNorm",  # Triton
+                revision="main",
+            )
+        },
+    }
+)
 
 register_kernel_mapping(kernel_layer_mapping)
 
@@ -110,15 +158,20 @@ class ReLUWithKernel(ReLU):
 
 
 class SiluAndMul(nn.Module):
-    def __init__(self):
+    def __init__(self, hidden_size: int | None = None):
         super().__init__()
         # Used to check that we called hub kernel.
         self.n_calls = 0
+        # When the hidden size is known, the split size is fixed and does
+        # not have to be derived from the input shape.
+        self._d = None if hidden_size is None else hidden_size // 2
 
     def forward(self, input: torch.Tensor) -> torch.Tensor:
         self.n_calls += 1
-        d = input.shape[-1] // 2
-        return F.silu(input[..., :d]) * input[..., d:]
+        d = input.shape[-1] // 2 if self._d is None else self._d
+        x, y = input.split(d, dim=-1)
+        # The output of silu is a fresh tensor, so we can multiply in-place.
+        return F.silu(x).mul_(y)
 
 
 @use_kernel_forward_from_hub("SiluAndMulNoCompile")
@@ -168,19 +221,15 @@ def test_arg_kinds():
 
 @pytest.mark.cuda_only
 @pytest.mark.parametrize("cls", [SiluAndMulWithKernel, SiluAndMulStringDevice])
-def test_hub_forward(cls):
-    torch.random.manual_seed(0)
-
-    silu_and_mul = SiluAndMul()
-    X = torch.randn((32, 64), device="cuda")
-    Y = silu_and_mul(X)
-
+def test_hub_forward(cls, reference_silu):
+    X, Y = reference_silu
     silu_and_mul_with_kernel = kernelize(cls(), device="cuda", mode=Mode.INFERENCE)
-    Y_kernel = silu_and_mul_with_kernel(X)
+
+    with torch.inference_mode():
+        Y_kernel = silu_and_mul_with_kernel(X)
 
     torch.testing.assert_close(Y_kernel, Y)
 
-    assert silu_and_mul.n_calls == 1
     assert silu_and_mul_with_kernel.n_calls == 0
 
 
@@ -409,56 +458,71 @@ def test_local_layer_repo(device):
 
 @pytest.mark.cuda_only
 @pytest.mark.parametrize("cls", [SiluAndMulWithKernel, SiluAndMulNoCompileKernel])
-@pytest.mark.parametrize("device", ["cuda"])
-def test_torch_compile_layer_without_fallback(cls, device):
-    silu_and_mul = SiluAndMul()
-
-    X = torch.randn((32, 64), dtype=torch.float32, device=device)
-    Y = silu_and_mul(X)
+def test_torch_compile_layer_without_fallback(cls, reference_silu, compiled_silu_kernel):
+    X, Y = reference_silu
 
-    silu_and_mul_with_kernel = cls()
-    silu_and_mul_with_kernel.eval()
+    silu_and_mul_with_kernel = cls(hidden_size=X.shape[-1]).eval()
 
     ctx = (
         pytest.raises(ValueError, match="does not support mode") if cls is SiluAndMulNoCompileKernel else nullcontext()
     )
     with ctx:
-        silu_and_mul_with_kernel = kernelize(
+        kernelize(
             silu_and_mul_with_kernel,
-            device=device,
+            device="cuda",
             mode=Mode.INFERENCE | Mode.TORCH_COMPILE,
             use_fallback=False,
         )
-    silu_and_mul_compiled = torch.compile(silu_and_mul_with_kernel, fullgraph=True)
+    silu_and_mul_compiled = compiled_silu_kernel(silu_and_mul_with_kernel)
 
-    Y_compiled = silu_and_mul_compiled(X)
+    with torch.inference_mode():
+        Y_compiled = silu_and_mul_compiled(X)
 
     torch.testing.assert_close(Y_compiled, Y)
 
 
 @pytest.mark.cuda_only
 @pytest.mark.parametrize("cls", [SiluAndMulWithKernel, SiluAndMulNoCompileKernel])
-@pytest.mark.parametrize("device", ["cuda"])
-def test_torch_compile_layer_with_fallback(cls, device):
-    silu_and_mul = SiluAndMul()
-
-    X = torch.randn((32, 64), dtype=torch.float32, device=device)
-    Y = silu_and_mul(X)
+def test_torch_compile_layer_with_fallback(cls, reference_silu, compiled_silu_kernel):
+    X, Y = reference_silu
 
-    silu_and_mul_with_kernel = cls()
-    silu_and_mul_with_kernel.eval()
     silu_and_mul_with_kernel = kernelize(
-        silu_and_mul_with_kernel,
-        device=device,
+        cls(hidden_size=X.shape[-1]).eval(),
+        device="cuda",
         mode=Mode.INFERENCE | Mode.TORCH_COMPILE,
     )
-    silu_and_mul_compiled = torch.compile(silu_and_mul_with_kernel, fullgraph=True)
+    silu_and_mul_compiled = compiled_silu_kernel(silu_and_mul_with_kernel)
 
-    Y_compiled = silu_and_mul_compiled(X)
+    with torch.inference_mode():
+        Y_compiled = silu_and_mul_compiled(X)
 
     torch.testing.assert_close(Y_compiled, Y)
 
 
+def test_mapping_context_is_snapshot():
+    repo_a = LocalLayerRepository(repo_path=Path("/non/existing/a"), layer_name="ReLU")
+    repo_b = LocalLayerRepository(repo_path=Path("/non/existing/b"), layer_name="ReLU")
+
+    with use_kernel_mapping({"ReLU": {"cpu": repo_a}}, inherit_mapping=False):
+        outer_context = contextvars.copy_context()
+        with use_kernel_mapping({}):
+            device_repos = _KERNEL_MAPPING.get()["ReLU"]["cpu"]
+
+            # Registrations in the outer context (e.g. from another thread)
+            # must not be visible in, or modify entries of, this context.
+            outer_context.run(
+                register_kernel_mapping,
+                {"ReLU": {"cpu": repo_b}, "SiluAndMul": {"cpu": repo_b}},
+            )
+
+            assert set(_KERNEL_MAPPING.get().keys()) == {"ReLU"}
+            assert _KERNEL_MAPPING.get()["ReLU"]["cpu"] is device_repos
+            assert device_repos.repos == {Mode.FALLBACK: repo_a}
+
+        assert set(_KERNEL_MAPPING.get().keys()) == {"ReLU", "SiluAndMul"}
+        assert _KERNEL_MAPPING.get()["ReLU"]["cpu"].repos == {Mode.FALLBACK: repo_b}
+
+
 @pytest.mark.cuda_only
 def test_mapping_contexts():
     # Make sure we start from scratch.
@@ -595,6 +659,12 @@ def test_validate_kernel_layer():
     ):
         _validate_layer(cls=BadLayer4, check_cls=SiluAndMul, repo=stub_repo(BadLayer4))
 
+    # Signatures are cached per class.
+    hits = _extract_forward_sig.cache_info().hits
+    with pytest.raises(TypeError, match="different kind of arguments"):
+        _validate_layer(cls=BadLayer4, check_cls=SiluAndMul, repo=stub_repo(BadLayer4))
+    assert _extract_forward_sig.cache_info().hits > hits
+
 
 @pytest.mark.cuda_only
 def test_invalid_mode_for_mapping_rejected():
@@ -618,8 +688,9 @@ def test_invalid_mode_for_mapping_rejected():
 
 
 @pytest.mark.cuda_only
-def test_kernel_modes():
+def test_kernel_modes(x_10_32_cuda):
     linear = TorchLinearWithCounter(32, 32).to("cuda")
+    X = x_10_32_cuda
 
     # Case 1: layer without further specification, becomes the
     #         base layer.
@@ -635,8 +706,8 @@ def test_kernel_modes():
         }
     ):
         kernelize(linear, mode=Mode.INFERENCE)
-        X = torch.randn(10, 32, device="cuda")
-        linear(X)
+        with torch.inference_mode():
+            linear(X)
         assert linear.n_calls == 0
 
         kernelize(linear, mode=Mode.TRAINING)
@@ -663,8 +734,8 @@ def test_kernel_modes():
         }
     ):
         kernelize(linear, mode=Mode.INFERENCE)
-        X = torch.randn(10, 32, device="cuda")
-        linear(X)
+        with torch.inference_mode():
+            linear(X)
         assert linear.n_calls == 0
 
         kernelize(linear, mode=Mode.TRAINING)
@@ -697,8 +768,8 @@ def test_kernel_modes():
         }
     ):
         kernelize(linear, mode=Mode.INFERENCE)
-        X = torch.randn(10, 32, device="cuda")
-        linear(X)
+        with torch.inference_mode():
+            linear(X)
         # Falls back to TRAINING.
         assert linear.n_calls == 1
 
@@ -727,8 +798,8 @@ def test_kernel_modes():
         }
     ):
         kernelize(linear, mode=Mode.INFERENCE)
-        X = torch.randn(10, 32, device="cuda")
-        linear(X)
+        with torch.inference_mode():
+            linear(X)
         # Falls back to the TRAINING | TORCH_COMPILE kernel.
         assert linear.n_calls == 1
 
@@ -767,7 +838,8 @@ def test_fallback_used_when_training():
         assert linear.n_calls == 0
 
         linear.eval()
-        linear(X)
+        with torch.inference_mode():
+            linear(X)
         assert linear.n_calls == 0
 
     # Case 2: kernel with implicit backward support should always
@@ -790,7 +862,8 @@ def test_fallback_used_when_training():
         assert linear.n_calls == 0
 
         linear.eval()
-        linear(X)
+        with torch.inference_mode():
+            linear(X)
         assert linear.n_calls == 0
 
 